@@ -1,10 +1,25 @@
 """Provide means to interpret formulas."""
 
-from lp.syntax import PropositionalSymbol, PontuationSymbol
+from functools import lru_cache
+
+from lp.syntax import PropositionalSymbol
 from lp.syntax import Negation, Conjunction, Disjunction
 from lp.syntax import Implication, BiImplication
 from lp.syntax import OpeningParenthesis, ClosingParenthesis
 from lp.syntax import UnaryOperator, BinaryOperator, Operator
+from lp.syntax import INITIAL_CHAR_DISPATCH
+
+
+# Opcodes of the truth table program instructions
+OP_AND, OP_OR, OP_IMPL, OP_IFF, OP_NOT = range(5)
+
+OPCODES = {
+    Conjunction: OP_AND,
+    Disjunction: OP_OR,
+    Implication: OP_IMPL,
+    BiImplication: OP_IFF,
+    Negation: OP_NOT,
+}
 
 
 class Scanner:
@@ -41,31 +56,21 @@ class Scanner:
         """Return the next token in the expression and tokenize it."""
         token = None
         current_char = Scanner.Char(self.get_current_char())
+        token_type = INITIAL_CHAR_DISPATCH.get(current_char.value)
 
-        if current_char.is_a(PropositionalSymbol):
-            token = self.get_propositional_symbol(current_char)
-
-        elif current_char.is_a(OpeningParenthesis):
-            token = OpeningParenthesis(current_char.value)
-            self.current_index += 1
-
-        elif current_char.is_a(ClosingParenthesis):
-            token = ClosingParenthesis(current_char.value)
-            self.current_index += 1
-
-        elif current_char.is_a(Implication):
+        if token_type is Negation:
+            # Could be either a negation or an implication
             token = self.get_implication(current_char)
 
-        elif current_char.is_a(Conjunction):
-            token = Conjunction(current_char.value)
-            self.current_index += 1
+        elif token_type is BiImplication:
+            token = self.get_bi_implication(current_char)
 
-        elif current_char.is_a(Disjunction):
-            token = Disjunction(current_char.value)
+        elif token_type is not None:
+            token = token_type(current_char.value)
             self.current_index += 1
 
-        elif current_char.is_a(BiImplication):
-            token = self.get_bi_implication(current_char)
+        elif current_char.is_a(PropositionalSymbol):
+            token = self.get_propositional_symbol(current_char)
 
         else:
             raise Exception('Invalid syntax on char "%s"' % current_char.value)
@@ -140,12 +145,16 @@ class Interpreter:
     """Ability to interpret a formula."""
 
     @classmethod
+    @lru_cache(maxsize=4096)
     def parse_expression(cls, expression):
         """
         Turn an expression to the Reverse Polish Notation (RPN).
 
         This method is an implementatin of the
         Djikstra's Shunting-yard algorithm.
+
+        The parsed formulas are cached by expression, so the same formula
+        object is shared by all the callers and must not be modified.
         """
         scanner = Scanner(expression)
 
@@ -154,47 +163,48 @@ class Interpreter:
         while scanner.there_are_tokens():
             token = scanner.read_next_token()
 
-            if token.is_a(PropositionalSymbol):
+            if token.IS_PROP:
                 output_queue.append(token)
 
-            elif token.is_a(Operator):
+            elif token.IS_OPERATOR:
                 o1 = token
                 o2 = operator_stack[-1] if operator_stack \
-                    and operator_stack[-1].is_a(Operator) else False
+                    and operator_stack[-1].IS_OPERATOR else False
                 while(
                     o2 and ((
-                        (o1.associativity is Operator.Associativity.LEFT) and
-                        (o1.precendence <= o2.precendence)
+                        (o1.associativity == Operator.Associativity.LEFT) and
+                        (o1.precedence <= o2.precedence)
                     ) or (
-                        (o1.associativity is Operator.Associativity.RIGHT) and
-                        (o1.precendence < o2.precendence)
+                        (o1.associativity == Operator.Associativity.RIGHT) and
+                        (o1.precedence < o2.precedence)
                     ))
                 ):
                     output_queue.append(operator_stack.pop())
                     o2 = operator_stack[-1] if operator_stack \
-                        and operator_stack[-1].is_a(Operator) else False
+                        and operator_stack[-1].IS_OPERATOR else False
 
                 operator_stack.append(o1)
 
-            elif token.is_a(OpeningParenthesis):
+            elif type(token) is OpeningParenthesis:
                 operator_stack.append(token)
 
-            elif token.is_a(ClosingParenthesis):
+            elif type(token) is ClosingParenthesis:
                 while(operator_stack and
-                      not operator_stack[-1].is_a(OpeningParenthesis)):
+                      type(operator_stack[-1]) is not OpeningParenthesis):
                     output_queue.append(operator_stack.pop())
 
                 if not operator_stack:
                     raise Exception('Parenthesis mismatched.')
 
                 popped = operator_stack.pop()
-                assert popped.is_a(OpeningParenthesis)
+                assert type(popped) is OpeningParenthesis
 
             else:
                 raise Exception('Token mismatched.')
 
         while(operator_stack):
-            if operator_stack[-1].is_a(PontuationSymbol):
+            # Only opening parenthesis are pushed among the operators
+            if type(operator_stack[-1]) is OpeningParenthesis:
                 raise Exception('Parenthesis mismatched.')
             output_queue.append(operator_stack.pop())
 
@@ -208,7 +218,7 @@ class Interpreter:
         formula_stack = []
         while rpn_tokens:
             token = rpn_tokens.pop()
-            if token.is_a(PropositionalSymbol):
+            if token.IS_PROP:
                 formula_stack.append(token)
             elif token.is_a(UnaryOperator):
                 arg = formula_stack.pop()
@@ -223,7 +233,7 @@ class Interpreter:
                 raise Exception('Invalid RPN expression.')
 
         # The formula_stack must contain only the result formula
-        assert len(formula_stack) is 1
+        assert len(formula_stack) == 1
 
         return formula_stack.pop()
 
@@ -240,7 +250,7 @@ class Formula:
         subformulas = []
         propositional_symbols = []
         for formula in self._get_subformulas():
-            if formula.is_a(PropositionalSymbol):
+            if formula.IS_PROP:
                 propositional_symbols.append(formula)
             else:
                 subformulas.append(formula)
@@ -278,68 +288,123 @@ class TruthTable:
         subformulas = self.order_lexicographically(self.subformulas)
         prop_symbols = self.order_lexicographically(self.prop_symbols)
 
-        m = len(subformulas)
         n = len(prop_symbols)
         lines_quantity = 2**n
 
         # First line is the subformulas
         lines = [[formula for formula in (prop_symbols + subformulas)]]
 
-        # Initialize all lines with n + m columns
-        for j in range(0, lines_quantity):
-            lines.append([[] for k in range(0, n + m)])
-
-        # Fill the propositional symbols with all possible values
-        i = n
-        while i > 0:
-            value = True
-            count = 0
-            for line_index in range(1, lines_quantity + 1):
-                if count == 2**(n - i):
-                    value = not value
-                    count = 0
-                line = lines[line_index]
-                line[i - 1] = value
-                count += 1
-            i -= 1
-
-        # Calculate the subformulas values
-        i = n + 1
-        while i <= (m + n):
-            for line_index in range(1, lines_quantity + 1):
-                line = lines[line_index]
-                current_formula = lines[0][i - 1]
-                line[i - 1] = current_formula.evaluate(
-                    self.get_symbols_value_for_line(line_index, lines=lines)
-                )
-            i += 1
-
+        # Each column is a bitmask where the bit i is the value on line i + 1,
+        # so every operator evaluates all the valuations with one int operation
+        all_ones = (1 << lines_quantity) - 1
+        masks = [
+            self.get_symbol_mask(n - 1 - i, all_ones) for i in range(n)
+        ]
+        self.run_program(self.compile_program(lines[0]), masks, all_ones)
+
+        # Unpack the columns bitmasks into the lines values, reversing the
+        # binary strings as the first line is the least significant bit
+        columns = [
+            format(mask, '0%db' % lines_quantity)[::-1] for mask in masks
+        ]
+        for bits in zip(*columns):
+            lines.append([bit == '1' for bit in bits])
+
+        self.masks = {
+            formula.str_representation(): mask
+            for formula, mask in zip(lines[0], masks)
+        }
+        self.all_ones = all_ones
         self.lines = lines
 
+    @classmethod
+    def compile_program(cls, formulas):
+        """
+        Lower the table formulas to a flat program.
+
+        Each instruction computes the column of an operator from the columns
+        of its args, like (opcode, arg1 column, arg2 column). The columns
+        are the indexes in the formulas list, so the propositional symbols
+        must come first and every formula must come after its subformulas.
+        """
+        columns = {}
+        program = []
+        for index, formula in enumerate(formulas):
+            columns[formula.str_representation()] = index
+            if formula.is_a(UnaryOperator):
+                program.append((
+                    OPCODES[type(formula)],
+                    columns[formula.arg1.str_representation()],
+                    None
+                ))
+            elif formula.is_a(BinaryOperator):
+                program.append((
+                    OPCODES[type(formula)],
+                    columns[formula.arg1.str_representation()],
+                    columns[formula.arg2.str_representation()]
+                ))
+        return program
+
+    @classmethod
+    def run_program(cls, program, masks, all_ones):
+        """
+        Run a truth table program, appending each computed column to masks.
+
+        The masks list must start with the propositional symbols columns.
+        """
+        for opcode, arg1, arg2 in program:
+            mask1 = masks[arg1]
+            if opcode == OP_NOT:
+                masks.append(~mask1 & all_ones)
+                continue
+
+            mask2 = masks[arg2]
+            if opcode == OP_AND:
+                masks.append(mask1 & mask2)
+            elif opcode == OP_OR:
+                masks.append(mask1 | mask2)
+            elif opcode == OP_IMPL:
+                masks.append((~mask1 | mask2) & all_ones)
+            else:
+                masks.append(~(mask1 ^ mask2) & all_ones)
+        return masks
+
+    @classmethod
+    def get_symbol_mask(cls, bit, all_ones):
+        """
+        Get the bitmask of a propositional symbol column.
+
+        The symbol is true on the lines whose index (starting from zero)
+        has the given bit unset, so it alternates between 2**bit true lines
+        and 2**bit false lines, starting with true ones.
+        """
+        block_size = 2**bit
+        block = (1 << block_size) - 1
+        # Repeat the true block once every two blocks to fill all the lines
+        return block * (all_ones // ((1 << (2 * block_size)) - 1))
+
     def order_lexicographically(self, formulas):
         """Order a set of formulas lexicographically."""
         # TO-DO
-        if formulas and formulas[0].is_a(PropositionalSymbol):
+        if formulas and formulas[0].IS_PROP:
             formulas.sort(key=lambda f: f.value)
-        elif formulas and formulas[0].is_a(Operator):
+        elif formulas and formulas[0].IS_OPERATOR:
             formulas.sort(key=lambda f: f.count_terms())
         return formulas
 
-    def get_symbols_value_for_line(self, line_index, lines=False):
+    def get_symbols_value_for_line(self, line_index):
         """
         Get the value of propositional symbols for a given line.
 
         Return dict like: {'p': True, 'q': False}
         """
-        if not lines:
-            lines = self.lines
-
         propositional_symbols = {
             i: symbol
             for i, symbol in enumerate(self.prop_symbols)
         }
         return {
-            propositional_symbols[i].str_representation(): lines[line_index][i]
+            propositional_symbols[i].str_representation():
+                self.lines[line_index][i]
             for i, symbol in enumerate(self.prop_symbols)
         }
 
@@ -355,7 +420,7 @@ class TruthTable:
         models = {}
         valuations = self.get_formula_valuations(formula)
         for line_index, valuation in valuations.items():
-            if valuation[1] is True:
+            if valuation[1]:
                 models[line_index] = valuation
         return models
 
@@ -364,32 +429,41 @@ class TruthTable:
         if not formula:
             formula = self.formula
 
-        formula_column = self.get_formula_index(formula)
+        formula_values = self.get_result_column(formula)
         valuations = {}
-        for line_index, line in enumerate(self.lines):
-            # Skip first line, because it is the formulas
-            if line_index is 0:
-                continue
+        for line_index, value in enumerate(formula_values, 1):
             symbols_values = self.get_symbols_value_for_line(line_index)
-            valuations[line_index] = (symbols_values, line[formula_column])
+            valuations[line_index] = (symbols_values, value)
         return valuations
 
-    def get_formula_index(self, formula):
-        """Get the formula column index on the truth table."""
-        all_formulas = self.lines[0]
-        formula_column = None
-        for index, subformula in enumerate(all_formulas):
-            if subformula.str_representation() == formula.str_representation():
-                formula_column = index
+    def get_result_column(self, formula=False):
+        """
+        Get the values of a given formula as a flat list.
+
+        The item i of the list is the formula value on the line i + 1.
+        """
+        return [
+            bit == '1' for bit in format(
+                self.get_formula_mask(formula), '0%db' % (len(self.lines) - 1)
+            )[::-1]
+        ]
+
+    def get_formula_mask(self, formula=False):
+        """
+        Get the valuations of a given formula as a bitmask.
+
+        The bit i of the mask is the formula value on the line i + 1.
+        """
+        if not formula:
+            formula = self.formula
 
-        if formula_column is None:
-            self.print_table()
+        formula_repr = formula.str_representation()
+        if formula_repr not in self.masks:
             raise Exception(
-                'Formula "%s" not present in truth table.'
-                % (formula.str_representation())
+                'Formula "%s" not present in truth table.' % formula_repr
             )
 
-        return formula_column
+        return self.masks[formula_repr]
 
     def str_representation(self):
         """Build the table string representation."""
@@ -398,7 +472,7 @@ class TruthTable:
             str_table += '['
             for formula_index, formula in enumerate(self.lines[0]):
                 str_table += formula.str_representation()
-                if formula_index is not len(self.lines[0]) - 1:
+                if formula_index != len(self.lines[0]) - 1:
                     str_table += ','
             str_table += '], '
             return str_table
@@ -412,21 +486,21 @@ class TruthTable:
                     str_table += 'V' if value else 'F'
                     # Separate each value with a comma,
                     # if it is not the last value
-                    if column_index is not len(line) - 1:
+                    if column_index != len(line) - 1:
                         str_table += ','
                 str_table += ']'
                 return str_table
 
             str_table += '['
             for line_index, line in enumerate(self.lines):
-                if line_index is 0:
+                if line_index == 0:
                     # Already treated above
                     continue
 
                 str_table = build_values_columns(str_table, line)
 
                 # Separate each line with a comma, if it is not the last line
-                if line_index is not len(self.lines) - 1:
+                if line_index != len(self.lines) - 1:
                     str_table += ', '
             str_table += ']'
 
@@ -450,12 +524,19 @@ class SetTruthTable(TruthTable):
     """Represent a truth table of set of formulas."""
 
     def __init__(self, expressions):
-        """."""
+        """
+        Build the truth table of the given formulas.
+
+        The formulas can be given either as expressions or already parsed.
+        """
         self.formulas = {}
         all_subformulas = []
         all_symbols = []
         for expression in expressions:
-            formula = Interpreter.parse_expression(expression)
+            if isinstance(expression, str):
+                formula = Interpreter.parse_expression(expression)
+            else:
+                formula = expression
             self.formulas[formula.str_representation()] = formula
             formula_handler = Formula(formula)
             subformulas, prop_symbols = formula_handler.get_subformulas()
@@ -471,31 +552,17 @@ class SetTruthTable(TruthTable):
         return super(SetTruthTable, self) \
             .get_formula_models(self.formulas[formula])
 
-    def get_formulas_set_models(self, formulas={}):
-        """Get the models of the set of formulas."""
-        if not formulas:
-            formulas = self.formulas
-
-        formula_indexes = {}
-        # Find out the formulas indexes in the table
-        for formula_index, formula in enumerate(self.lines[0]):
-            if formula.str_representation() in formulas:
-                formula_indexes[formula_index] = formula
-
-        models = {}
-        for line_index, line in enumerate(self.lines):
-            if line_index is 0:
-                continue
-
-            column_value = None
-            for column_index, value in enumerate(line):
-                if column_index in formula_indexes:
-                    column_value = column_value and value \
-                        if column_value is not None else value
+    def get_formulas_set_mask(self, formulas=()):
+        """
+        Get the models of the set of formulas as a bitmask.
 
-            if column_value is True:
-                models[line_index] = self.get_symbols_value_for_line(
-                    line_index
-                )
+        The formulas must be parsed formulas present in the table. If no
+        formulas are given, the set is all the formulas of the table.
+        """
+        if not formulas:
+            formulas = self.formulas.values()
 
-        return models
+        mask = self.all_ones
+        for formula in formulas:
+            mask &= self.get_formula_mask(formula)
+        return mask
@@ -1,11 +1,18 @@
 """Describe the language syntax."""
 
 import re
+from weakref import WeakValueDictionary
 
 
 class Symbol:
     """Describes the language symbols."""
 
+    __slots__ = ('value',)
+
+    # Tell the kind of symbol without walking the class hierarchy
+    IS_PROP = False
+    IS_OPERATOR = False
+
     # General pattern of formulas
     pattern = '([a-z0-9&\-\|><\(\)]*)'
     accepted_chars = '([a-z0-9&\-\|><\(\)]*)'
@@ -14,17 +21,62 @@ class Symbol:
         """Init a propositional symbol."""
         self.value = value
 
+    def __init_subclass__(cls, **kwargs):
+        """Compile the subclass patterns once, when the class is created."""
+        super().__init_subclass__(**kwargs)
+        cls.compile_patterns()
+
+    @classmethod
+    def compile_patterns(cls):
+        """Compile the patterns used to check the symbol chars."""
+        cls._full_re = re.compile(r'^%s$' % cls.pattern)
+        cls._initial_re = re.compile(
+            r'^%s$' % getattr(cls, 'accepted_initial_char', cls.pattern)
+        )
+
     @classmethod
     def check(cls, symbol):
         """Check if the given arg is a symbol."""
-        regexp = re.compile(r'^%s$' % cls.pattern)
-        return regexp.match(symbol)
+        return cls._full_re.match(symbol)
 
     @classmethod
     def accepts_initial_char(cls, char):
         """Check if the operator accepts the given char as initial char."""
-        regexp = re.compile(r'^%s$' % cls.accepted_initial_char)
-        return regexp.match(char)
+        return cls._initial_re.match(char)
+
+    def get_args(self):
+        """Get the symbol args, a symbol alone has none."""
+        return ()
+
+    def subformulas(self):
+        """
+        Get the formula subformulas.
+
+        Return the subformulas of its args followed by itself.
+        The list is computed once and cached, so it must not be mutated.
+        """
+        if self._subformulas is None:
+            self._subformulas = list(self.iter_postorder())
+        return self._subformulas
+
+    def iter_postorder(self):
+        """
+        Iterate over the formula and its subformulas in post-order.
+
+        Uses an explicit stack, so deep formulas do not hit the recursion
+        limit. Each formula is pushed first as not visited, to push its
+        args, and then as visited, to be yielded after them.
+        """
+        stack = [(self, False)]
+        while stack:
+            formula, visited = stack.pop()
+            if visited:
+                yield formula
+            else:
+                stack.append((formula, True))
+                # Push the last arg first, so the first one is walked first
+                for arg in reversed(formula.get_args()):
+                    stack.append((arg, False))
 
     def is_a(self, cls):
         """Check if this token is a given type."""
@@ -35,6 +87,10 @@ class Symbol:
         return self.value
 
 
+# Subclasses compile their patterns on creation, but Symbol itself is not one
+Symbol.compile_patterns()
+
+
 class PropositionalSymbol(Symbol):
     """
     Describes the propositional symbols of the language.
@@ -46,16 +102,28 @@ class PropositionalSymbol(Symbol):
         p, p1, q23, r1890
     """
 
+    __slots__ = ('_subformulas', '__weakref__')
+
     accepted_initial_char = '[a-z]'
     pattern = '([a-z]{1}[0-9]*)'
 
-    def subformulas(self):
-        """
-        Get the formula subformulas.
+    IS_PROP = True
 
-        Return itself as it is a propositional symbol.
-        """
-        return [self]
+    # Symbols bind tighter than any operator, so they never need parenthesis
+    precedence = 7
+
+    # Instances by value, as each symbol is created only once. The references
+    # are weak, so the symbols no longer used by any formula are dropped
+    _pool = WeakValueDictionary()
+
+    def __new__(cls, value):
+        """Get the propositional symbol of the given value."""
+        symbol = cls._pool.get(value)
+        if symbol is None:
+            symbol = super().__new__(cls)
+            symbol._subformulas = [symbol]
+            cls._pool[value] = symbol
+        return symbol
 
     def str_representation(self):
         """String representation of the symbol."""
@@ -78,12 +146,16 @@ class PontuationSymbol(Symbol):
     opening and closing parenthesis.
     """
 
+    __slots__ = ()
+
     pattern = '([\(\)])'
 
 
 class OpeningParenthesis(PontuationSymbol):
     """Describes the opening parenthesis."""
 
+    __slots__ = ()
+
     accepted_initial_char = '\('
     pattern = '\('
 
@@ -91,6 +163,8 @@ class OpeningParenthesis(PontuationSymbol):
 class ClosingParenthesis(PontuationSymbol):
     """Describes the closing parenthesis."""
 
+    __slots__ = ()
+
     accepted_initial_char = '\)'
     pattern = '\)'
 
@@ -98,16 +172,16 @@ class ClosingParenthesis(PontuationSymbol):
 class Operator(Symbol):
     """Base class for language operators."""
 
+    __slots__ = ()
+
+    IS_OPERATOR = True
+
     class Associativity:
         """Possible operators associativity."""
 
         LEFT = 1
         RIGHT = 0
 
-    def subformulas(self):
-        """Get the formula subformulas."""
-        raise NotImplementedError
-
     def evaluate(self, symbol_values):
         """Evaluate an operator with given values."""
         raise NotImplementedError
@@ -120,39 +194,42 @@ class Operator(Symbol):
 class BinaryOperator(Operator):
     """Describe binary operators."""
 
+    __slots__ = ('arg1', 'arg2', '_subformulas', '_repr')
+
     def set_args(self, arg1, arg2):
         """Set the operator args."""
         self.arg1 = arg1
         self.arg2 = arg2
+        self._subformulas = None
+        self._repr = None
 
-    def subformulas(self):
-        """
-        Get the formula subformulas.
-
-        Return itself and the subformulas of its first and second args.
-        """
-        return self.arg1.subformulas() + self.arg2.subformulas() + [self]
+    def get_args(self):
+        """Get the operator args."""
+        return (self.arg1, self.arg2)
 
     def str_representation(self):
         """String representation of the formula."""
-        if self.arg1.is_a(PropositionalSymbol) or (
-            self.arg1.is_a(Operator) and
-            self.precendence <= self.arg1.precendence
-        ):
-            # In this case do not need parenthesis
-            arg1_repr = self.arg1.str_representation()
-        else:
-            arg1_repr = '(' + self.arg1.str_representation() + ')'
-
-        if self.arg2.is_a(PropositionalSymbol) or (
-            self.arg2.is_a(Operator) and
-            self.precendence <= self.arg2.precendence
-        ):
-            arg2_repr = self.arg2.str_representation()
-        else:
-            arg2_repr = '(' + self.arg2.str_representation() + ')'
+        if self._repr is None:
+            self._repr = self._build_str_representation()
+        return self._repr
+
+    def _build_str_representation(self):
+        """Build the string representation of the formula."""
+        return ''.join([
+            self.arg_str_representation(self.arg1),
+            self.SYMBOL,
+            self.arg_str_representation(self.arg2)
+        ])
+
+    def arg_str_representation(self, arg):
+        """
+        String representation of an arg of the formula.
 
-        return arg1_repr + self.SYMBOL + arg2_repr
+        The arg is put inside parenthesis if it binds weaker than the operator.
+        """
+        if self.precedence > arg.precedence:
+            return '(' + arg.str_representation() + ')'
+        return arg.str_representation()
 
     def count_terms(self):
         """Count the terms of the formula."""
@@ -162,21 +239,27 @@ class BinaryOperator(Operator):
 class UnaryOperator(Operator):
     """Describe unary operators."""
 
+    __slots__ = ('arg1', '_subformulas', '_repr')
+
     def set_arg(self, arg):
         """Set the operator arg."""
         self.arg1 = arg
+        self._subformulas = None
+        self._repr = None
 
-    def subformulas(self):
-        """
-        Get the formula subformulas.
-
-        Return itself and the subformulas of its arg.
-        """
-        return self.arg1.subformulas() + [self]
+    def get_args(self):
+        """Get the operator arg."""
+        return (self.arg1,)
 
     def str_representation(self):
         """String representation of the formula."""
-        if self.arg1.is_a(PropositionalSymbol):
+        if self._repr is None:
+            self._repr = self._build_str_representation()
+        return self._repr
+
+    def _build_str_representation(self):
+        """Build the string representation of the formula."""
+        if self.arg1.IS_PROP:
             return self.SYMBOL + self.arg1.str_representation()
         else:
             return self.SYMBOL + '(' + self.arg1.str_representation() + ')'
@@ -189,11 +272,13 @@ class UnaryOperator(Operator):
 class Negation(UnaryOperator):
     """Describe the negation operator."""
 
+    __slots__ = ()
+
     SYMBOL = '-'
     accepted_initial_char = '\-'
     pattern = '\-'
 
-    precendence = 6
+    precedence = 6
     associativity = Operator.Associativity.RIGHT
 
     def evaluate(self, symbol_values):
@@ -204,11 +289,13 @@ class Negation(UnaryOperator):
 class Conjunction(BinaryOperator):
     """Describe the conjunction operator."""
 
+    __slots__ = ()
+
     SYMBOL = '&'
     accepted_initial_char = '&'
     pattern = '&'
 
-    precendence = 5
+    precedence = 5
     associativity = Operator.Associativity.LEFT
 
     def evaluate(self, symbol_values):
@@ -220,11 +307,13 @@ class Conjunction(BinaryOperator):
 class Disjunction(BinaryOperator):
     """Describe the disjunction operator."""
 
+    __slots__ = ()
+
     SYMBOL = '|'
     accepted_initial_char = '\|'
     pattern = '\|'
 
-    precendence = 4
+    precedence = 4
     associativity = Operator.Associativity.LEFT
 
     def evaluate(self, symbol_values):
@@ -236,11 +325,13 @@ class Disjunction(BinaryOperator):
 class Implication(BinaryOperator):
     """Describe the implication operator."""
 
+    __slots__ = ()
+
     SYMBOL = '->'
     accepted_initial_char = '\-'
     pattern = '\->'
 
-    precendence = 3
+    precedence = 3
     associativity = Operator.Associativity.LEFT
 
     def evaluate(self, symbol_values):
@@ -256,11 +347,13 @@ class Implication(BinaryOperator):
 class BiImplication(BinaryOperator):
     """Describe the bi-implication operator."""
 
+    __slots__ = ()
+
     SYMBOL = '<->'
     accepted_initial_char = '<'
     pattern = '<\->'
 
-    precendence = 2
+    precedence = 2
     associativity = Operator.Associativity.LEFT
 
     def evaluate(self, symbol_values):
@@ -276,3 +369,16 @@ class BiImplication(BinaryOperator):
             not self.arg2.evaluate(symbol_values) or
             self.arg1.evaluate(symbol_values)
         )
+
+
+# Token type of each single initial char. The '-' char may also start an
+# implication, so the scanner must peek the next char to tell them apart.
+# Propositional symbols are not listed as they span multiple chars.
+INITIAL_CHAR_DISPATCH = {
+    '(': OpeningParenthesis,
+    ')': ClosingParenthesis,
+    '&': Conjunction,
+    '|': Disjunction,
+    '-': Negation,
+    '<': BiImplication,
+}
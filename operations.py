@@ -3,6 +3,10 @@
 from lp.interpreter import Interpreter, TruthTable, SetTruthTable
 
 
+# Translation table to remove the whitespaces and brackets of a line
+STRIP_TABLE = str.maketrans('', '', ' \t\n\r\f\v[]')
+
+
 class Operation:
     """Base class for operations."""
 
@@ -32,20 +36,22 @@ class SemanticStatus(Operation):
     def perform(self, formula):
         """Check a formula semantic status."""
         truth_table = TruthTable(formula)
-        valuations = truth_table.get_formula_valuations()
-
-        formula_values = []
-        for line, valuation in valuations.items():
-            formula_values.append(valuation[1])
-
-        status = self.check_status(formula_values)
+        status = self.check_status(
+            truth_table.get_formula_mask(),
+            truth_table.all_ones
+        )
 
         return '[%s, [%s]]' % (status, truth_table.str_representation())
 
-    def check_status(self, formula_values):
-        """Get the formulas semantic status based on its valuations."""
-        tautology = True in formula_values and False not in formula_values
-        contradiction = False in formula_values and True not in formula_values
+    def check_status(self, formula_mask, all_ones):
+        """
+        Get the formulas semantic status based on its valuations.
+
+        The valuations are given as a truth table bitmask, where all_ones
+        is the mask of a formula true in all the valuations.
+        """
+        tautology = formula_mask == all_ones
+        contradiction = formula_mask == 0
 
         if tautology:
             status = "TAUTOLOGIA"
@@ -74,26 +80,16 @@ class SemanticEquivalence(Operation):
 
     def check_equivalence(self, formula1, formula2):
         """."""
-        truth_table = SetTruthTable([formula1, formula2])
-
         formula1 = Interpreter.parse_expression(formula1)
         formula2 = Interpreter.parse_expression(formula2)
 
-        models1 = truth_table.get_formula_models(formula1.str_representation())
-        models2 = truth_table.get_formula_models(formula2.str_representation())
+        truth_table = SetTruthTable([formula1, formula2])
 
-        equivalent = True
-        for valuation_index, valuation in models1.items():
-            if valuation_index not in models2:
-                equivalent = False
-                break
+        models1 = truth_table.get_formula_mask(formula1)
+        models2 = truth_table.get_formula_mask(formula2)
 
-        if equivalent:
-            # Check if the second formula models are in the first formula
-            for valuation_index, valuation in models2.items():
-                if valuation_index not in models1:
-                    equivalent = False
-                    break
+        # The formulas are equivalent if they have exactly the same models
+        equivalent = models1 == models2
 
         return equivalent, truth_table
 
@@ -106,7 +102,7 @@ class Consistency(Operation):
     def perform(self, formulas):
         """Check if the set of formulas is consistent."""
         truth_table = SetTruthTable(formulas)
-        formulas_models = truth_table.get_formulas_set_models()
+        formulas_models = truth_table.get_formulas_set_mask()
 
         consistent = 'SIM' if formulas_models else 'NAO'
 
@@ -117,12 +113,9 @@ class Consistency(Operation):
 
     def parse(self, line):
         """Parse a bracketed, comma separated formulas into a list."""
-        # Remove the operation symbol from the line
-        line = line.replace(self.SYMBOL, '')
-        # Remove the whitespaces and the first character (that will be a comma)
-        line = "".join(line.split())[1:]
-        # Remove the brackets of the string
-        line = line.replace('[', '').replace(']', '')
+        # Remove the operation symbol, the whitespaces, the brackets
+        # and the first character (that will be a comma) from the line
+        line = line.replace(self.SYMBOL, '', 1).translate(STRIP_TABLE)[1:]
         # Split the line on comma to get all formulas of the set as list
         args = line.split(',')
         return [args]
@@ -135,27 +128,19 @@ class LogicConsequence(Operation):
 
     def perform(self, formulas_set, formula):
         """Check if the formula is logic consequence of the formulas_set."""
-        if '' in formulas_set and len(formulas_set) is 1:
+        if '' in formulas_set and len(formulas_set) == 1:
             return self.is_logic_consequence_of_empty_set(formula)
 
-        truth_table = SetTruthTable(formulas_set + [formula])
+        formulas = [Interpreter.parse_expression(f) for f in formulas_set]
         formula = Interpreter.parse_expression(formula)
 
-        formulas = {}
-        for f in formulas_set:
-            form = Interpreter.parse_expression(f)
-            formulas[form.str_representation()] = form
+        truth_table = SetTruthTable(formulas + [formula])
 
-        set_models = truth_table.get_formulas_set_models(formulas)
-        formula_models = truth_table.get_formula_models(
-            formula.str_representation()
-        )
+        set_models = truth_table.get_formulas_set_mask(formulas)
+        formula_models = truth_table.get_formula_mask(formula)
 
-        logic_consequence = True
-        for valuation_index, valuation in set_models.items():
-            if valuation_index not in formula_models:
-                logic_consequence = False
-                break
+        # Every model of the set must be a model of the formula
+        logic_consequence = (set_models & ~formula_models) == 0
 
         consequence = 'SIM' if logic_consequence else 'NAO'
 
@@ -167,13 +152,13 @@ class LogicConsequence(Operation):
     def is_logic_consequence_of_empty_set(self, formula):
         """Check if a formula is logic consequence of the empty set."""
         truth_table = TruthTable(formula)
-        valuations = truth_table.get_formula_valuations()
 
-        logic_consequence = True
-        for valuation_index, valuation in valuations.items():
-            if valuation[1] is False:
-                logic_consequence = False
-                break
+        # Only the tautologies are logic consequence of the empty set
+        status = SemanticStatus().check_status(
+            truth_table.get_formula_mask(),
+            truth_table.all_ones
+        )
+        logic_consequence = status == "TAUTOLOGIA"
 
         consequence = 'SIM' if logic_consequence else 'NAO'
 
@@ -184,12 +169,9 @@ class LogicConsequence(Operation):
 
     def parse(self, line):
         """Parse a bracketed, comma separated formulas into a list."""
-        # Remove the operation symbol from the line
-        line = line.replace(self.SYMBOL, '')
-        # Remove the whitespaces and the first character (that will be a comma)
-        line = "".join(line.split())[1:]
-        # Remove the brackets of the string
-        line = line.replace('[', '').replace(']', '')
+        # Remove the operation symbol, the whitespaces, the brackets
+        # and the first character (that will be a comma) from the line
+        line = line.replace(self.SYMBOL, '', 1).translate(STRIP_TABLE)[1:]
         # Split the line on comma to get all formulas of the set as list
         args = line.split(',')
         # The set of formulas will be all the elements but the last one
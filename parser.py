@@ -20,7 +20,7 @@ if not path.isfile(input_file):
 
 # Load each line of the file to a list
 with open(input_file) as file:
-    entries = [entry.strip() for entry in file if entry is not '\n']
+    entries = [entry.strip() for entry in file if entry != '\n']
 
 # Regexp to match only the accepted characters
 pattern = re.compile(r'^\[([a-z0-9SEQCL, &\-\|><\(\)\[\]]*)\]$')